@@ -1,6 +1,27 @@
 from .record import record_post
-from .search import similar_posts, similar_posts_old
+from .search import (
+    similar_posts,
+    similar_posts_old,
+    similar_posts_streaming,
+    similar_posts_two_stage,
+    two_stage_recall,
+)
 from .batch import batch_fill
 from .delete import delete_post
+from .coarse import fit_projection
+from .check import check_and_record
+from .segments import evict_segments
 
-__all__ = ["record_post", "similar_posts", "similar_posts_old", "batch_fill", "delete_post"]
+__all__ = [
+    "record_post",
+    "check_and_record",
+    "similar_posts",
+    "similar_posts_old",
+    "similar_posts_streaming",
+    "similar_posts_two_stage",
+    "two_stage_recall",
+    "batch_fill",
+    "delete_post",
+    "fit_projection",
+    "evict_segments",
+]
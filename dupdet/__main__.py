@@ -0,0 +1,53 @@
+import argparse
+import sys
+from . import bulk
+
+
+def _add_common(p: argparse.ArgumentParser, batch_size: int) -> None:
+    p.add_argument("--batch-size", type=int, default=batch_size, help=f"rows per batch (default {batch_size})")
+    p.add_argument("--workers", type=int, default=1, help="parallel batches (default 1)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m dupdet", description="Bulk ingest / query / dedupe.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("ingest", help="stream posts (JSONL/CSV) into the database and embed them")
+    p.add_argument("path", help="input file, or - for stdin")
+    p.add_argument("--topic", default=None, help="topic for records without one")
+    p.add_argument("--format", choices=["jsonl", "csv"], default=None, help="input format (default: from extension)")
+    _add_common(p, 64)
+
+    p = sub.add_parser("query", help="search every query of a file, write JSONL hits")
+    p.add_argument("path", help="input file (JSONL/CSV/TXT), or - for stdin")
+    p.add_argument("-o", "--out", default="-", help="output JSONL (default stdout)")
+    p.add_argument("--topic", default=None)
+    p.add_argument("--top-k", type=int, default=10)
+    p.add_argument("--min-score", type=float, default=0.80, help="raw cosine threshold")
+    p.add_argument("--format", choices=["jsonl", "csv", "txt"], default=None)
+    _add_common(p, 64)
+
+    p = sub.add_parser("dedupe", help="write duplicate pairs of a topic as JSONL")
+    p.add_argument("topic", help='topic to scan ("" for all posts)')
+    p.add_argument("-o", "--out", default="-", help="output JSONL (default stdout)")
+    p.add_argument("--min-score", type=float, default=0.80, help="raw cosine threshold")
+    _add_common(p, 256)
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "ingest":
+        bulk.ingest(args.path, topic=args.topic, batch_size=args.batch_size,
+                    workers=args.workers, fmt=args.format)
+    elif args.cmd == "query":
+        bulk.query(args.path, out=args.out, topic=args.topic, top_k=args.top_k,
+                   min_score=args.min_score, batch_size=args.batch_size,
+                   workers=args.workers, fmt=args.format)
+    elif args.cmd == "dedupe":
+        n = bulk.dedupe(args.topic, out=args.out, min_score=args.min_score,
+                        batch_size=args.batch_size, workers=args.workers)
+        print(f"[dupdet] dedupe: {n} pairs", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,20 @@
 from typing import Iterable, Tuple, Optional
 import numpy as np
 from .storage import (
-    upsert_post,
-    upsert_embedding,
+    upsert_posts,
+    upsert_embeddings,
     missing_embedding_posts,
     delete_post_and_embedding,
 )
-from .embedder import embed_text_document
+from .embedder import embed_text_documents
+from .migrate import serving
+from .coarse import index_embeddings
 
 
 def batch_fill(topic: str, posts: Optional[Iterable[Tuple[str, str]]] = None) -> None:
+    model, version = serving()
     if posts:  # only if posts were passed in
-        for pid, txt in posts:
-            upsert_post(pid, txt, topic)
+        upsert_posts((pid, txt, topic) for pid, txt in posts)
 
     pending = missing_embedding_posts(topic)
     if not pending:
@@ -22,9 +24,9 @@ def batch_fill(topic: str, posts: Optional[Iterable[Tuple[str, str]]] = None) ->
     B = 32
     for i in range(0, len(texts), B):
         chunk = texts[i:i + B]
-        embs = [embed_text_document(t) for t in chunk]
-        for pid, vec in zip(post_ids[i:i + B], embs):
-            upsert_embedding(pid, vec)
+        items = list(zip(post_ids[i:i + B], embed_text_documents(chunk, model_name=model)))
+        upsert_embeddings(items, version)
+        index_embeddings(items, version)
 
 
 def delete_post(post_id: str) -> bool:
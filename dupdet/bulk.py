@@ -0,0 +1,272 @@
+import csv
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, TextIO, Tuple
+import numpy as np
+from .storage import upsert_posts, upsert_embeddings, count_embeddings, iter_embedding_blocks
+from .embedder import embed_text_documents, embed_text_queries
+from .migrate import serving
+from .coarse import index_embeddings
+from .calibration import calibrate
+from .config import CFG
+from .search import _effective_topic, _select
+
+# Streaming building blocks behind `python -m dupdet`. Input files are read
+# record by record and processed in fixed-size batches, with at most
+# 2 * workers batches in flight, so memory does not grow with the file size.
+
+
+# --- I/O helpers ---
+@contextmanager
+def _open_in(path: str):
+    if path == "-":
+        yield sys.stdin
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            yield f
+
+
+@contextmanager
+def _open_out(path: str):
+    if path == "-":
+        yield sys.stdout
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            yield f
+
+
+def _guess_format(path: str) -> str:
+    p = path.lower()
+    if p.endswith(".csv"):
+        return "csv"
+    if p.endswith(".txt"):
+        return "txt"
+    return "jsonl"
+
+
+def read_records(path: str, fmt: Optional[str] = None) -> Iterator[dict]:
+    """Yields one dict per record of a JSONL / CSV (with header) / plain-text file."""
+    fmt = (fmt or _guess_format(path)).lower()
+    with _open_in(path) as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        elif fmt == "jsonl":
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        elif fmt == "txt":
+            for line in f:
+                line = line.rstrip("\n")
+                if line.strip():
+                    yield {"text": line}
+        else:
+            raise ValueError(f"unknown input format: {fmt!r}")
+
+
+def _batched(it: Iterable, n: int) -> Iterator[list]:
+    it = iter(it)
+    while True:
+        chunk = list(islice(it, max(int(n), 1)))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _pipelined(batches: Iterable, fn: Callable, workers: int) -> Iterator[tuple]:
+    """Runs fn on batches in a thread pool and yields (batch, result) in input order."""
+    workers = max(int(workers), 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for b in batches:
+            pending.append((b, pool.submit(fn, b)))
+            if len(pending) >= 2 * workers:
+                b0, fut = pending.popleft()
+                yield b0, fut.result()
+        while pending:
+            b0, fut = pending.popleft()
+            yield b0, fut.result()
+
+
+class _Progress:
+    def __init__(self, label: str, every: float = 2.0, stream: TextIO = sys.stderr):
+        self.label = label
+        self.every = every
+        self.stream = stream
+        self.n = 0
+        self.t0 = time.perf_counter()
+        self._last = self.t0
+
+    def update(self, n: int) -> None:
+        self.n += n
+        now = time.perf_counter()
+        if now - self._last >= self.every:
+            self._last = now
+            self._print(now)
+
+    def done(self) -> None:
+        self._print(time.perf_counter(), final=True)
+
+    def _print(self, now: float, final: bool = False) -> None:
+        dt = max(now - self.t0, 1e-9)
+        tail = " (done)" if final else ""
+        print(f"[dupdet] {self.label}: {self.n} rows, {self.n / dt:.1f} rows/s, {dt:.1f}s{tail}",
+              file=self.stream, flush=True)
+
+
+def _load_matrix(topic: Optional[str], version) -> Tuple[List[str], Optional[np.ndarray]]:
+    """(ids, (N, D) matrix) of the topic, read block by block into one preallocated array."""
+    n = count_embeddings(topic, version)
+    ids: List[str] = []
+    M = None
+    blocks = iter_embedding_blocks(topic, version, CFG.stream_block_size)
+    try:
+        for block_ids, block in blocks:
+            if M is None:
+                M = np.empty((n, block.shape[1]), dtype=np.float32)
+            k = min(len(block_ids), n - len(ids))  # rows added after the count are left out
+            M[len(ids):len(ids) + k] = block[:k]
+            ids.extend(block_ids[:k])
+            if len(ids) == n:
+                break
+    finally:
+        blocks.close()
+    if not ids:
+        return [], None
+    return ids, M[:len(ids)]
+
+
+def _record_id(rec: dict, *keys: str) -> Optional[str]:
+    for k in keys:
+        v = rec.get(k)
+        if v is not None and str(v) != "":
+            return str(v)
+    return None
+
+
+# --- commands ---
+def ingest(
+    path: str,
+    topic: Optional[str] = None,
+    batch_size: int = 64,
+    workers: int = 1,
+    fmt: Optional[str] = None,
+) -> int:
+    """
+    Streams posts from a file into the database, embedding them batch by batch.
+    Records need `post_id` (or `id`) and `text`; a per-record `topic` overrides `topic`.
+    Returns the number of posts written.
+    """
+    def rows() -> Iterator[Tuple[str, str, Optional[str]]]:
+        for rec in read_records(path, fmt):
+            pid = _record_id(rec, "post_id", "id")
+            text = rec.get("text")
+            if pid is None or not text:
+                print("[dupdet] ingest: skipping record without id/text:", rec, file=sys.stderr)
+                continue
+            yield pid, text, (rec.get("topic") or topic)
+
+    model, version = serving()
+
+    def embed(batch: List[Tuple[str, str, Optional[str]]]) -> List[np.ndarray]:
+        return embed_text_documents([text for _, text, _ in batch], model_name=model)
+
+    prog = _Progress("ingest")
+    for batch, vecs in _pipelined(_batched(rows(), batch_size), embed, workers):
+        items = [(pid, vec) for (pid, _, _), vec in zip(batch, vecs)]
+        upsert_posts(batch)
+        upsert_embeddings(items, version)
+        index_embeddings(items, version)
+        prog.update(len(batch))
+    prog.done()
+    return prog.n
+
+
+def query(
+    path: str,
+    out: str = "-",
+    topic: Optional[str] = None,
+    top_k: int = 10,
+    min_score: float = 0.80,
+    batch_size: int = 64,
+    workers: int = 1,
+    fmt: Optional[str] = None,
+) -> int:
+    """
+    Runs every query of a file against one topic and writes one JSON line per query:
+    {"query_id", "text", "hits": [{"post_id", "score", "raw"}, ...]}.
+    The topic's vectors are loaded once for the whole run. Returns the number of queries.
+    Queries are scored together with one matrix product per batch, so raw scores can
+    differ from similar_posts in the last float32 bit (a hit right at min_score can flip);
+    only similar_posts and similar_posts_streaming are guaranteed to agree exactly.
+    """
+    model, version = serving()
+    ids, M = _load_matrix(_effective_topic(topic), version)
+
+    def records() -> Iterator[Tuple[str, str]]:
+        for n, rec in enumerate(read_records(path, fmt)):
+            text = rec.get("text") or rec.get("query")
+            if text:
+                yield (_record_id(rec, "query_id", "id") or str(n)), text
+
+    def embed(batch: List[Tuple[str, str]]) -> np.ndarray:
+        return np.vstack(embed_text_queries([text for _, text in batch], model_name=model))
+
+    prog = _Progress("query")
+    with _open_out(out) as f:
+        for batch, Q in _pipelined(_batched(records(), batch_size), embed, workers):
+            S = Q @ M.T if M is not None else None
+            for r, (qid, text) in enumerate(batch):
+                hits = _select(ids, S[r], top_k, min_score) if S is not None else []
+                f.write(json.dumps({
+                    "query_id": qid,
+                    "text": text,
+                    "hits": [{"post_id": pid, "score": cal, "raw": raw} for pid, cal, raw in hits],
+                }, ensure_ascii=False) + "\n")
+            prog.update(len(batch))
+    prog.done()
+    return prog.n
+
+
+def dedupe(
+    topic: Optional[str],
+    out: str = "-",
+    min_score: float = 0.80,
+    batch_size: int = 256,
+    workers: int = 1,
+) -> int:
+    """
+    Writes every pair of posts in `topic` whose raw cosine is >= min_score as
+    {"a", "b", "score", "raw"} JSON lines. Scores `batch_size` rows against the
+    topic at a time. Returns the number of pairs.
+    """
+    ids, M = _load_matrix(_effective_topic(topic), serving()[1])
+    if M is None:
+        return 0
+    batch_size = max(int(batch_size), 1)
+
+    def score(start: int) -> List[Tuple[int, int, float]]:
+        S = M[start:start + batch_size] @ M.T
+        pairs = []
+        for r in range(S.shape[0]):
+            i = start + r
+            row = S[r, i + 1:]
+            for j in np.nonzero(row >= min_score)[0]:
+                pairs.append((i, i + 1 + int(j), float(row[j])))
+        return pairs
+
+    prog = _Progress("dedupe")
+    n_pairs = 0
+    with _open_out(out) as f:
+        for start, pairs in _pipelined(range(0, len(ids), batch_size), score, workers):
+            for i, j, raw in pairs:
+                f.write(json.dumps({"a": ids[i], "b": ids[j], "score": calibrate(raw), "raw": raw}) + "\n")
+            n_pairs += len(pairs)
+            prog.update(min(batch_size, len(ids) - start))
+    prog.done()
+    return n_pairs
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 from .config import CFG
 
 def _clip01(x: float) -> float:
@@ -26,3 +27,18 @@ def calibrate(raw: float) -> float:
     if m == "logistic":
         return _logistic(raw, CFG.cal_logistic_k, CFG.cal_logistic_x0)
     return raw
+
+def calibrate_array(raw: np.ndarray) -> np.ndarray:
+    """Vectorized calibrate(), same values element-wise."""
+    raw = np.asarray(raw, dtype=np.float64)
+    m = (CFG.calibration_method or "").lower()
+    if m == "minmax":
+        lo, hi = CFG.cal_min_raw, CFG.cal_max_raw
+        out = np.zeros_like(raw) if hi <= lo else np.clip((raw - lo) / (hi - lo), 0.0, 1.0)
+    elif m == "logistic":
+        with np.errstate(over="ignore"):
+            out = 1.0 / (1.0 + np.exp(-CFG.cal_logistic_k * (raw - CFG.cal_logistic_x0)))
+    else:
+        out = raw.copy()
+    out[np.abs(raw - 1.0) < 1e-6] = 1.0
+    return out
@@ -0,0 +1,64 @@
+from typing import List, Optional, Tuple
+import numpy as np
+from .embedder import embed_text_document
+from .storage import write_transaction, read_meta, replace_post_with_embedding
+from .resident import catch_up, resident_vectors
+from .coarse import index_embeddings
+from .migrate import serving, _SERVING_KEY
+from .search import _effective_topic, _rank
+
+# catch_up + locked delta rounds before check_and_record reloads under the lock
+_ATTEMPTS = 3
+
+def check_and_record(
+    post_id: str,
+    text: str,
+    topic: Optional[str] = None,
+    top_k: Optional[int] = 10,
+    min_score: Optional[float] = 0.80,
+    skip_duplicates: bool = False
+) -> List[Tuple[str, float, float]]:
+    """
+    similar_posts + record_post in one pass: embeds `text` once (as a document, so
+    scores are document-to-document), searches the resident vectors of `topic`
+    and stores the post with its embedding in the same write transaction.
+    Concurrent checkers are serialized, so of two simultaneous duplicates the
+    second always sees the first. Resident vectors are loaded before the write
+    lock is taken; inside it only rows committed in the meantime are read. If a
+    model switch commits before the lock is taken, the text is embedded again
+    with the new serving model.
+
+    RETURNS (post_id, calibrated_score, raw_score) of the earlier posts it matches.
+    With skip_duplicates=True a post with any hit is not stored.
+    """
+    model, version = serving()
+    vec: np.ndarray = embed_text_document(text, model_name=model)
+
+    key = _effective_topic(topic)
+    attempt = 0
+    while True:
+        catch_up(key, version)
+        with write_transaction() as con:
+            switched = read_meta(con, _SERVING_KEY) != model
+            # None: something bumped the epoch since catch_up; the last attempt reloads here
+            found = None if switched else resident_vectors(con, key, version, reload=attempt >= _ATTEMPTS - 1)
+            if found is not None:
+                ids, M = found
+                hits = _rank(ids, M, vec, max(top_k, 0) + 1, min_score) if ids else []
+                hits = [h for h in hits if h[0] != post_id][:max(top_k, 0)]
+
+                stored = not (skip_duplicates and hits)
+                if stored:
+                    replace_post_with_embedding(con, post_id, text, topic, vec, version)
+                break
+
+        if switched:
+            # promote_next_embeddings committed since serving() was read
+            model, version = serving()
+            vec = embed_text_document(text, model_name=model)
+        else:
+            attempt += 1
+
+    if stored:
+        index_embeddings([(post_id, vec)], version)
+    return hits
@@ -0,0 +1,124 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .config import CFG
+from .embedder import embedding_version
+from .storage import (
+    Version,
+    iter_embedding_blocks,
+    get_or_set_meta,
+    read_connection,
+    read_epoch,
+    save_projection,
+    load_projection,
+    upsert_coarse_embeddings,
+)
+from .resident import catch_up
+
+# Low-dimensional copies of the stored embeddings, used by the two-stage search
+# to shortlist candidates before rescoring them with the full vectors.
+#
+# "pca" fits an uncentered PCA (top eigenvectors of M^T M). Leaving the data
+# uncentered keeps the projection tuned to preserve dot products, which is what
+# the coarse scan ranks by. "truncate" keeps the leading dimensions as-is and
+# only makes sense for Matryoshka-trained models.
+#
+# The projection is fitted on the vectors of one embedding version and only
+# vectors of that version get coarse copies. Both the projection and the coarse
+# matrix stay resident in the process and are refreshed on the meta epoch /
+# new rowids (see resident.py).
+
+
+def _fit_components(version: Version, dim: int, method: str) -> Optional[np.ndarray]:
+    if method == "truncate":
+        blocks = iter_embedding_blocks(version=version, block_size=1)
+        first = next(blocks, None)
+        blocks.close()
+        if first is None:
+            return None
+        D = first[1].shape[1]
+        return np.eye(max(1, min(int(dim), D)), D, dtype=np.float32)
+    if method != "pca":
+        raise ValueError(f"unknown coarse_method: {method!r}")
+
+    # (D, D) scatter matrix accumulated block by block, instead of an SVD of the (N, D) corpus
+    C = None
+    for _, M in iter_embedding_blocks(version=version, block_size=CFG.stream_block_size):
+        M = M.astype(np.float64)
+        if C is None:
+            C = M.T @ M
+        else:
+            C += M.T @ M
+    if C is None:
+        return None
+    dim = max(1, min(int(dim), C.shape[0]))
+    _, vecs = np.linalg.eigh(C)          # ascending eigenvalues
+    return vecs[:, ::-1][:, :dim].T.astype(np.float32)
+
+
+def fit_projection(dim: Optional[int] = None, method: Optional[str] = None) -> int:
+    """
+    Fits the projection on the stored embeddings of the serving model and
+    (re)builds the coarse vectors. Returns the number of posts indexed.
+    """
+    dim = dim or CFG.coarse_dim
+    method = (method or CFG.coarse_method or "pca").lower()
+    # the pin of migrate.serving_model (migrate imports this module)
+    version = embedding_version(get_or_set_meta("serving_model", CFG.model_name))
+
+    P = _fit_components(version, dim, method)
+    if P is None:
+        return 0
+    save_projection(method, P, version)
+
+    # project everything first: writing while the read cursor is open would wait on it
+    blocks = [(ids, (M @ P.T).astype(np.float32))
+              for ids, M in iter_embedding_blocks(version=version, block_size=CFG.stream_block_size)]
+    n = 0
+    for ids, low in blocks:
+        upsert_coarse_embeddings(zip(ids, low))
+        n += len(ids)
+    return n
+
+
+_PROJECTION: Dict[str, Tuple[int, Optional[Tuple[str, np.ndarray, Version]]]] = {}
+
+
+def _projection() -> Optional[Tuple[str, np.ndarray, Version]]:
+    key = str(CFG.db_path)
+    with read_connection() as con:
+        epoch = read_epoch(con)
+    cached = _PROJECTION.get(key)
+    if cached is None or cached[0] != epoch:
+        # a refit bumps the epoch like any other rewrite
+        cached = _PROJECTION[key] = (epoch, load_projection())
+    return cached[1]
+
+
+def project(vec: np.ndarray, version: Version) -> Optional[np.ndarray]:
+    """
+    Projects a full `version` vector (or an (N, D) matrix) into the coarse space,
+    or None if no projection exists for that version.
+    """
+    stored = _projection()
+    if stored is None:
+        return None
+    _, P, fitted = stored
+    vec = np.asarray(vec, dtype=np.float32)
+    if tuple(fitted) != tuple(version) or vec.shape[-1] != P.shape[1]:
+        return None
+    return (vec @ P.T).astype(np.float32)
+
+
+def coarse_vectors(topic: Optional[str] = None) -> Tuple[List[str], np.ndarray]:
+    """Resident (ids, (N, dim) coarse matrix) of the topic."""
+    return catch_up(topic, kind="coarse")
+
+
+def index_embeddings(items: Sequence[Tuple[str, np.ndarray]], version: Version) -> None:
+    """Keeps the coarse copies of freshly written `version` embeddings in sync (no-op until a projection is fitted)."""
+    if not items:
+        return
+    ids, vecs = zip(*items)
+    low = project(np.vstack(vecs), version)
+    if low is not None:
+        upsert_coarse_embeddings(zip(ids, low))
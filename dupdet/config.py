@@ -23,4 +23,27 @@ class Config:
     cal_logistic_k: float = 15
     cal_logistic_x0: float = 0.71
 
+    # === Two-stage search ===
+    # "pca" | "truncate" (Matryoshka-style: keep the leading dimensions)
+    coarse_method: str = "pca"
+    coarse_dim: int = 128
+    # how many coarse candidates get rescored with the full vectors
+    coarse_shortlist: int = 200
+
+    # === Time-windowed search ===
+    # daily segments kept in memory (least recently used are evicted)
+    segment_cache_size: int = 30
+
+    # === Streaming exact search ===
+    # rows read from SQLite and scored per step of similar_posts_streaming
+    stream_block_size: int = 4096
+
+    # === check_and_record ===
+    # resident (topic, version) vector copies kept in memory (least recently used are dropped)
+    resident_cache_size: int = 8
+
+    # === Evaluation ===
+    # per-model embedding cache of `python -m dupdet.evaluation`
+    eval_cache_dir: Path = Path("./.dupdet_cache")
+
 CFG = Config()
@@ -1,4 +1,6 @@
+import inspect
 from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
 import numpy as np
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from .config import CFG
@@ -31,28 +33,45 @@ def _resolve_instructions(model_name: str):
     return qi, ti
 
 
-@lru_cache(maxsize=1)
-def _get_embedder() -> HuggingFaceEmbedding:
-    model_name = CFG.model_name
+def version_tag(model_name: str) -> Tuple[str, str]:
+    """(model, instruction) tag for vectors of `model_name`, assuming it loads (no fallback)."""
+    qi, ti = _resolve_instructions(model_name)
+    return model_name, f"{qi}|{ti}"
+
+
+def _make(model_name: str) -> Tuple[HuggingFaceEmbedding, Tuple[str, str]]:
+    qi, ti = _resolve_instructions(model_name)
+    emb = HuggingFaceEmbedding(
+        model_name=model_name,
+        query_instruction=qi,
+        text_instruction=ti,
+        device=CFG.device,
+    )
+    return emb, version_tag(model_name)
+
+
+@lru_cache(maxsize=2)  # serving model + migration target
+def _load(model_name: str) -> Tuple[HuggingFaceEmbedding, Tuple[str, str]]:
     try:
-        qi, ti = _resolve_instructions(model_name)
-        return HuggingFaceEmbedding(
-            model_name=model_name,
-            query_instruction=qi,
-            text_instruction=ti,
-            device=CFG.device,
-        )
+        return _make(model_name)
     except Exception as e:
         print("[dupdet] Warning: could not load", model_name, "->", e)
         fallback = "intfloat/multilingual-e5-base"
         print("[dupdet] Falling back to", fallback)
-        qi, ti = _resolve_instructions(fallback)
-        return HuggingFaceEmbedding(
-            model_name=fallback,
-            query_instruction=qi,
-            text_instruction=ti,
-            device=CFG.device,
-        )
+        print("[dupdet] Searches and writes refuse to run while", model_name, "is the serving model")
+        return _make(fallback)
+
+
+def _get_embedder(model_name: Optional[str] = None) -> HuggingFaceEmbedding:
+    return _load(model_name or CFG.model_name)[0]
+
+
+def embedding_version(model_name: Optional[str] = None) -> Tuple[str, str]:
+    """
+    (model, instruction) tag of the vectors the embedder for `model_name` produces.
+    Reports the model actually loaded, so a silent fallback gets a different tag.
+    """
+    return _load(model_name or CFG.model_name)[1]
 
 
 def _maybe_translate(text: str) -> str:
@@ -64,18 +83,46 @@ def _maybe_translate(text: str) -> str:
     return text
 
 
-def embed_text_document(text: str) -> np.ndarray:
+def embed_text_document(text: str, model_name: Optional[str] = None) -> np.ndarray:
     text = _maybe_translate(text)
-    emb = _get_embedder().get_text_embedding(text)
+    emb = _get_embedder(model_name).get_text_embedding(text)
     return _l2(emb)
 
 
-def embed_text_query(text: str) -> np.ndarray:
+def embed_text_query(text: str, model_name: Optional[str] = None) -> np.ndarray:
     text = _maybe_translate(text)
-    emb = _get_embedder().get_query_embedding(text)
+    emb = _get_embedder(model_name).get_query_embedding(text)
     return _l2(emb)
 
 
+def embed_text_documents(texts: Sequence[str], model_name: Optional[str] = None) -> List[np.ndarray]:
+    """Batched embed_text_document: one forward pass per batch instead of per text."""
+    texts = [_maybe_translate(t) for t in texts]
+    embs = _get_embedder(model_name).get_text_embedding_batch(texts)
+    return [_l2(e) for e in embs]
+
+
+def embed_text_queries(texts: Sequence[str], model_name: Optional[str] = None) -> List[np.ndarray]:
+    """Batched embed_text_query: one forward pass per batch instead of per text."""
+    texts = [_maybe_translate(t) for t in texts]
+    embedder = _get_embedder(model_name)
+    # get_query_embedding is _embed([text], prompt_name="query"); llama-index has no
+    # public batched form (get_text_embedding_batch applies the document instruction)
+    if _has_prompt_name(embedder):
+        embs = embedder._embed(texts, prompt_name="query")
+    else:
+        embs = [embedder.get_query_embedding(t) for t in texts]
+    return [_l2(e) for e in embs]
+
+
+def _has_prompt_name(embedder) -> bool:
+    fn = getattr(embedder, "_embed", None)
+    try:
+        return fn is not None and "prompt_name" in inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+
+
 # --- Debug helpers ---
 def _cos(a, b) -> float:
     return float(np.dot(a, b))
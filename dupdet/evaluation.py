@@ -0,0 +1,224 @@
+import argparse
+import csv
+import hashlib
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .config import CFG
+from .embedder import embed_text_documents, embedding_version
+from .calibration import calibrate_array
+from .bulk import read_records, _batched
+
+# Labelled-pair evaluation.
+#
+# Usage:
+#   python -m dupdet.evaluation pairs.jsonl --curves curves.csv
+# Each record: text_a, text_b, label (1 = duplicate), optional lang_a / lang_b
+# (or group). Unique texts are embedded once and cached on disk per model, every
+# pair is scored in vectorized blocks, and all thresholds are swept at once.
+# Pairs without group or language fall into the "unknown" group; the row
+# pooling every pair is keyed None, so no group name can collide with it.
+
+_TRUE = {"true", "yes", "y", "dup", "duplicate"}
+_FALSE = {"false", "no", "n", "not_dup", "not_duplicate"}
+_UNKNOWN = "unknown"
+_POOLED_LABEL = "(all pairs)"
+
+
+def _label(value) -> Optional[bool]:
+    """True / False for a duplicate / non-duplicate label (numbers: non-zero is a duplicate), None if missing or unreadable."""
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    try:
+        return float(text) != 0
+    except ValueError:
+        return None
+
+
+def load_pairs(path: str, fmt: Optional[str] = None) -> Tuple[List[str], List[str], np.ndarray, List[str]]:
+    """
+    Returns (texts_a, texts_b, labels as bool array, group per pair) from a JSONL/CSV file.
+    Pairs without a readable label are skipped with a warning on stderr.
+    """
+    a, b, labels, groups = [], [], [], []
+    unlabelled = 0
+    for rec in read_records(path, fmt):
+        ta = rec.get("text_a", rec.get("a"))
+        tb = rec.get("text_b", rec.get("b"))
+        if not ta or not tb:
+            continue
+        lab = _label(rec.get("label"))
+        if lab is None:
+            unlabelled += 1
+            continue
+        labels.append(lab)
+        if rec.get("group"):
+            groups.append(str(rec["group"]))
+        elif rec.get("lang_a") or rec.get("lang_b"):
+            groups.append(f"{rec.get('lang_a') or '?'}-{rec.get('lang_b') or '?'}")
+        else:
+            groups.append(_UNKNOWN)
+        a.append(ta)
+        b.append(tb)
+    if unlabelled:
+        print(f"[dupdet] evaluation: skipped {unlabelled} pairs without a usable label", file=sys.stderr)
+    return a, b, np.array(labels, dtype=bool), groups
+
+
+# --- on-disk embedding cache ---
+def _cache_file(model_name: Optional[str]) -> Path:
+    model, instruction = embedding_version(model_name)
+    tag = hashlib.sha1(f"{model}|{instruction}|{CFG.translate_to_english}".encode("utf-8")).hexdigest()[:12]
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in model)
+    return Path(CFG.eval_cache_dir) / f"{safe}-{tag}.npz"
+
+
+def _key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def embed_cached(texts: Sequence[str], model_name: Optional[str] = None, batch_size: int = 64) -> np.ndarray:
+    """(len(texts), D) document embeddings; only texts missing from the model's disk cache are embedded."""
+    path = _cache_file(model_name)
+    keys = [_key(t) for t in texts]
+
+    cached_keys: List[str] = []
+    cached = None
+    if path.exists():
+        with np.load(path) as z:
+            cached_keys = list(z["keys"])
+            cached = z["vecs"]
+    row = {k: i for i, k in enumerate(cached_keys)}
+
+    missing = list(dict.fromkeys(t for t, k in zip(texts, keys) if k not in row))
+    if missing:
+        new = []
+        for chunk in _batched(missing, batch_size):
+            new.extend(embed_text_documents(chunk, model_name=model_name))
+        new_vecs = np.vstack(new)
+        cached = new_vecs if cached is None else np.vstack([cached, new_vecs])
+        for t in missing:
+            row[_key(t)] = len(row)
+        cached_keys = cached_keys + [_key(t) for t in missing]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, keys=np.array(cached_keys), vecs=cached)
+        tmp.replace(path)
+
+    return cached[[row[k] for k in keys]]
+
+
+# --- scoring / sweeps ---
+def pair_scores(texts_a: Sequence[str], texts_b: Sequence[str], model_name: Optional[str] = None,
+                block: int = 65536) -> np.ndarray:
+    """Raw cosine of every (a, b) pair; each text is embedded once."""
+    uniq = list(dict.fromkeys(list(texts_a) + list(texts_b)))
+    index = {t: i for i, t in enumerate(uniq)}
+    E = embed_cached(uniq, model_name)
+    ia = np.fromiter((index[t] for t in texts_a), dtype=np.int64, count=len(texts_a))
+    ib = np.fromiter((index[t] for t in texts_b), dtype=np.int64, count=len(texts_b))
+
+    out = np.empty(len(ia), dtype=np.float32)
+    for s in range(0, len(ia), block):  # row-wise dot products, bounded temporaries
+        out[s:s + block] = np.einsum("ij,ij->i", E[ia[s:s + block]], E[ib[s:s + block]])
+    return out
+
+
+def sweep_thresholds(scores: np.ndarray, labels: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Precision / recall / F1 at every distinct score used as threshold (predict
+    duplicate when score >= threshold), thresholds in descending order.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    labels = np.asarray(labels, dtype=bool)
+    order = np.argsort(-scores, kind="stable")
+    s = scores[order]
+    tp = np.cumsum(labels[order])
+    fp = np.cumsum(~labels[order])
+
+    # last position of every run of equal scores
+    last = np.r_[np.nonzero(np.diff(s))[0], len(s) - 1] if len(s) else np.array([], dtype=np.int64)
+    tp, fp, thr = tp[last], fp[last], s[last]
+
+    positives = int(labels.sum())
+    precision = tp / np.maximum(tp + fp, 1)
+    recall = tp / positives if positives else np.zeros_like(precision)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(denom), where=denom > 0)
+    return {"threshold": thr, "precision": precision, "recall": recall, "f1": f1}
+
+
+def _best(curve: Dict[str, np.ndarray]) -> Dict[str, float]:
+    if not len(curve["f1"]):
+        return {"threshold": float("nan"), "precision": 0.0, "recall": 0.0, "f1": 0.0}
+    i = int(np.argmax(curve["f1"]))
+    return {k: float(v[i]) for k, v in curve.items()}
+
+
+def evaluate(
+    path: str,
+    model_name: Optional[str] = None,
+    on: str = "cal",
+    fmt: Optional[str] = None,
+) -> Tuple[Dict[Optional[str], dict], Dict[Optional[str], Dict[str, np.ndarray]]]:
+    """
+    Scores a labelled pair file and sweeps thresholds on calibrated ("cal") or
+    raw cosine ("raw") scores. Returns (best operating point per group, curves per
+    group); key None pools every pair.
+    """
+    texts_a, texts_b, labels, groups = load_pairs(path, fmt)
+    raw = pair_scores(texts_a, texts_b, model_name)
+    scores = calibrate_array(raw) if on == "cal" else raw.astype(np.float64)
+
+    groups_arr = np.array(groups)
+    report: Dict[Optional[str], dict] = {}
+    curves: Dict[Optional[str], Dict[str, np.ndarray]] = {}
+    for g in [None] + sorted(set(groups)):
+        mask = np.ones(len(groups_arr), dtype=bool) if g is None else groups_arr == g
+        curves[g] = sweep_thresholds(scores[mask], labels[mask])
+        report[g] = dict(_best(curves[g]), n=int(mask.sum()), positives=int(labels[mask].sum()))
+    return report, curves
+
+
+def write_curves(curves: Dict[Optional[str], Dict[str, np.ndarray]], path: str) -> None:
+    """One CSV row per (group, threshold); the pooled curve has an empty group."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["group", "threshold", "precision", "recall", "f1"])
+        for g, c in curves.items():
+            for row in zip(c["threshold"], c["precision"], c["recall"], c["f1"]):
+                w.writerow(["" if g is None else g] + [f"{v:.6f}" for v in row])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m dupdet.evaluation",
+                                     description="Precision/recall/F1 sweeps over labelled pairs.")
+    parser.add_argument("path", help="labelled pairs (JSONL/CSV)")
+    parser.add_argument("--model", default=None, help="embedding model (default CFG.model_name)")
+    parser.add_argument("--on", choices=["cal", "raw"], default="cal", help="sweep calibrated or raw scores")
+    parser.add_argument("--curves", default=None, help="write full curves to this CSV")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    report, curves = evaluate(args.path, model_name=args.model, on=args.on)
+    print(f"{'group':<12} {'n':>8} {'pos':>8} {'thr':>8} {'P':>7} {'R':>7} {'F1':>7}")
+    for g, r in report.items():
+        print(f"{_POOLED_LABEL if g is None else g:<12} {r['n']:>8} {r['positives']:>8} {r['threshold']:>8.4f} "
+              f"{r['precision']:>7.3f} {r['recall']:>7.3f} {r['f1']:>7.3f}")
+    if args.curves:
+        write_curves(curves, args.curves)
+    print(f"[dupdet] evaluation: {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import threading
+import time
+from typing import Optional, Tuple
+from .config import CFG
+from .embedder import embed_text_documents, embedding_version
+from .coarse import index_embeddings
+from .storage import (
+    Version,
+    get_or_set_meta,
+    pending_next_embeddings,
+    count_next_embeddings,
+    upsert_next_embeddings,
+    upsert_embeddings,
+    promote_next_embeddings,
+    stale_embedding_posts,
+)
+
+# Online model migration.
+#
+# The database pins the model it serves from (meta "serving_model"), so changing
+# CFG.model_name does not silently mix vectors: reads and writes keep using the
+# pinned model until reembed() has filled embeddings_next with vectors from the
+# new model for every post, then swaps both in one transaction.
+
+_SERVING_KEY = "serving_model"
+
+
+def serving_model() -> str:
+    """Model that searches and new posts use; pinned to CFG.model_name on first use."""
+    return get_or_set_meta(_SERVING_KEY, CFG.model_name)
+
+
+def serving() -> Tuple[str, Version]:
+    """
+    (serving model, its version tag) for searches and writes. Raises RuntimeError
+    if this process could only load a fallback model: its vectors match nothing
+    stored, so it would search an empty corpus and accept every duplicate.
+    """
+    model = serving_model()
+    version = embedding_version(model)
+    if version[0] != model:
+        raise RuntimeError(
+            f"[dupdet] serving model {model} could not be loaded (fell back to {version[0]}); "
+            "refusing to search or write with vectors that match nothing stored"
+        )
+    return model, version
+
+
+def serving_version() -> Version:
+    return serving()[1]
+
+
+def migration_status(target_model: Optional[str] = None) -> dict:
+    target = target_model or CFG.model_name
+    serving = serving_model()
+    done, total = count_next_embeddings(embedding_version(target))
+    if target == serving:
+        done = total
+    return {"serving": serving, "target": target, "done": done, "total": total}
+
+
+def reembed(
+    target_model: Optional[str] = None,
+    batch_size: int = 32,
+    pause: float = 0.5,
+    max_batches: Optional[int] = None,
+) -> bool:
+    """
+    Embeds every post with `target_model` (default CFG.model_name) into embeddings_next,
+    sleeping `pause` seconds between batches, then switches serving to it atomically.
+    Resumable: already embedded posts are skipped.
+
+    Afterwards (and also when already serving the target) re-embeds any post whose
+    vector carries another tag: posts written by a process that fell back to
+    another model, or by a record_post that read the old serving model just
+    before the swap. Returns True once every post is served by the target,
+    False if it stopped after `max_batches` or the target itself falls back.
+    """
+    target = target_model or CFG.model_name
+    version = embedding_version(target)
+    if version[0] != target:
+        print("[dupdet] reembed: could not load", target, "- nothing changed")
+        return False
+
+    batches = 0
+    if target != serving_model():
+        while True:
+            if max_batches is not None and batches >= max_batches:
+                return False
+
+            pending = pending_next_embeddings(version, batch_size)
+            if not pending:
+                if promote_next_embeddings(version, _SERVING_KEY, target):
+                    break
+                continue  # posts were added since the last batch
+
+            post_ids, texts = zip(*pending)
+            upsert_next_embeddings(zip(post_ids, embed_text_documents(texts, model_name=target)), version)
+            batches += 1
+            if pause > 0:
+                time.sleep(pause)
+        print("[dupdet] Now serving embeddings from", target)
+
+    while True:
+        if max_batches is not None and batches >= max_batches:
+            return False
+
+        stale = stale_embedding_posts(version, batch_size)
+        if not stale:
+            return True
+
+        post_ids, texts = zip(*stale)
+        items = list(zip(post_ids, embed_text_documents(texts, model_name=target)))
+        upsert_embeddings(items, version)
+        index_embeddings(items, version)
+        batches += 1
+        if pause > 0:
+            time.sleep(pause)
+
+
+def start_reembed(**kwargs) -> threading.Thread:
+    """Runs reembed(**kwargs) in a daemon thread and returns it."""
+    t = threading.Thread(target=reembed, kwargs=kwargs, name="dupdet-reembed", daemon=True)
+    t.start()
+    return t
@@ -1,14 +1,18 @@
 from typing import Optional
 import numpy as np
 from .embedder import embed_text_document
+from .migrate import serving
 from .storage import upsert_post, upsert_embedding, delete_post_and_embedding
+from .coarse import index_embeddings
 
 def record_post(post_id: str, text: str, topic: Optional[str] = None) -> None:
+    model, version = serving()
     try:
         delete_post_and_embedding(post_id)
     except Exception as e:
         print("[dupdet] record_post: pre-delete failed:", e)
 
     upsert_post(post_id, text, topic)
-    vec: np.ndarray = embed_text_document(text)
-    upsert_embedding(post_id, vec)
+    vec: np.ndarray = embed_text_document(text, model_name=model)
+    upsert_embedding(post_id, vec, version)
+    index_embeddings([(post_id, vec)], version)
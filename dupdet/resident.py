@@ -0,0 +1,132 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+from .config import CFG
+from .storage import (
+    Version,
+    read_connection,
+    read_epoch,
+    max_embedding_rowid,
+    fetch_embeddings_after,
+    max_coarse_rowid,
+    fetch_coarse_after,
+)
+
+# Process-resident copies of the stored vectors, one per (kind, topic, version),
+# at most CFG.resident_cache_size of them (least recently used are dropped).
+# Kind "embeddings" holds the full vectors (check_and_record), "coarse" the
+# low-dimensional copies the two-stage search scans.
+#
+# New rows are picked up incrementally by rowid. Anything else that changes
+# stored vectors (deletes, updates, topic moves, a model promotion) bumps the
+# meta "epoch" through triggers, which forces a full reload.
+#
+# catch_up() does the loading through a plain read connection, so the bulk of
+# it happens without the database write lock; resident_vectors() is then called
+# inside the write transaction and only reads the rows committed in between.
+
+
+_SOURCES = {
+    "embeddings": (max_embedding_rowid, fetch_embeddings_after),
+    "coarse": (max_coarse_rowid, fetch_coarse_after),
+}
+
+
+class _Resident:
+    def __init__(self, kind: str):
+        self.lock = threading.Lock()
+        self.max_rowid, self.fetch_after = _SOURCES[kind]
+        self.reset(None)
+
+    def reset(self, epoch: Optional[int]) -> None:
+        # fresh objects, so (ids, matrix) handed out earlier stay valid
+        self.epoch = epoch
+        self.last_rowid = 0
+        self.ids: List[str] = []
+        self.buf: Optional[np.ndarray] = None  # (capacity, D), first len(ids) rows valid
+
+    def append(self, rows: List[Tuple[int, str, np.ndarray]]) -> None:
+        if not rows:
+            return
+        n, k = len(self.ids), len(rows)
+        dim = rows[0][2].shape[0]
+        if self.buf is None or n + k > self.buf.shape[0]:
+            cap = max(2 * (n + k), 1024)
+            buf = np.empty((cap, dim), dtype=np.float32)
+            if self.buf is not None and n:
+                buf[:n] = self.buf[:n]
+            self.buf = buf
+        self.buf[n:n + k] = np.vstack([vec for _, _, vec in rows])
+        self.ids.extend(pid for _, pid, _ in rows)
+
+    def sync(self, con: sqlite3.Connection, topic: Optional[str], version: Optional[Version]) -> None:
+        # epoch first: if anything is rewritten while the rows are read, the
+        # entry is tagged with the old epoch and reloaded on the next check
+        epoch = read_epoch(con)
+        if self.epoch != epoch:
+            self.reset(epoch)
+        top = self.max_rowid(con)
+        if top > self.last_rowid:
+            self.append(self.fetch_after(con, self.last_rowid, topic=topic, version=version, upto=top))
+            # rows of other topics/versions up to `top` need not be scanned again
+            self.last_rowid = top
+
+    def matrix(self) -> np.ndarray:
+        n = len(self.ids)
+        if self.buf is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self.buf[:n]
+
+
+_CACHE: "OrderedDict[Tuple[str, str, Optional[str], Optional[Version]], _Resident]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def _entry(kind: str, topic: Optional[str], version: Optional[Version]) -> _Resident:
+    key = (str(CFG.db_path), kind, topic, version)
+    with _LOCK:
+        entry = _CACHE.get(key)
+        if entry is None:
+            entry = _CACHE[key] = _Resident(kind)
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > max(int(CFG.resident_cache_size), 1):
+            _CACHE.popitem(last=False)
+    return entry
+
+
+def catch_up(
+    topic: Optional[str] = None,
+    version: Optional[Version] = None,
+    kind: str = "embeddings",
+) -> Tuple[List[str], np.ndarray]:
+    """Loads (or extends) the resident copy for the topic without taking the write lock and returns (ids, matrix)."""
+    entry = _entry(kind, topic, version)
+    with entry.lock, read_connection() as con:
+        entry.sync(con, topic, version)
+        return entry.ids, entry.matrix()
+
+
+def resident_vectors(
+    con: sqlite3.Connection,
+    topic: Optional[str] = None,
+    version: Optional[Version] = None,
+    reload: bool = True,
+) -> Optional[Tuple[List[str], np.ndarray]]:
+    """
+    Returns (ids, (N, D) matrix) for the topic, brought up to date through `con`.
+    With reload=False returns None instead of reloading everything when the
+    epoch moved since the last catch_up.
+    """
+    entry = _entry("embeddings", topic, version)
+    with entry.lock:
+        if not reload and entry.epoch != read_epoch(con):
+            return None
+        entry.sync(con, topic, version)
+        return entry.ids, entry.matrix()
+
+
+def clear_resident() -> None:
+    with _LOCK:
+        _CACHE.clear()
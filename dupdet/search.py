@@ -1,8 +1,14 @@
-from typing import List, Tuple, Optional
+import heapq
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple, Optional, Union
 import numpy as np
+from .config import CFG
 from .embedder import embed_text_query
-from .storage import fetch_embeddings
+from .storage import Version, fetch_embeddings, fetch_embeddings_by_ids, iter_embedding_blocks
 from .calibration import calibrate
+from .coarse import project, coarse_vectors
+from .migrate import serving
+from .segments import window_start, window_vectors
 
 def similar_posts_old(
     query_text: str,
@@ -37,23 +43,153 @@ def similar_posts(
     query_text: str,
     top_k: Optional[int] = 10,
     min_score: Optional[float] = 0.80,
-    topic: Optional[str] = None
+    topic: Optional[str] = None,
+    since: Optional[Union[datetime, str]] = None,
+    window: Optional[Union[timedelta, float]] = None
 ) -> List[Tuple[str, float, float]]:
     """
     RETURNS (post_id, calibrated_score, raw_score).
+    `since` (datetime / ISO string, naive = UTC) and/or `window` (timedelta or days)
+    restrict the search to posts updated in that period, scanning only its daily segments.
     """
-    # Treat "" as None (match-all)
-    effective_topic = None if (topic is None or str(topic).strip() == "") else topic
+    model, version = serving()
+    q = embed_text_query(query_text, model_name=model).astype(np.float32)
 
-    q = embed_text_query(query_text).astype(np.float32)
-    items = fetch_embeddings(topic=effective_topic)
-    if not items:
+    start = window_start(since, window)
+    if start is None:
+        return _exact(q, top_k, min_score, _effective_topic(topic), version)
+
+    ids, M = window_vectors(start, _effective_topic(topic), version)
+    if not ids:
         return []
+    return _rank(ids, M, q, top_k, min_score)
+
+
+def similar_posts_two_stage(
+    query_text: str,
+    top_k: Optional[int] = 10,
+    min_score: Optional[float] = 0.80,
+    topic: Optional[str] = None,
+    shortlist: Optional[int] = None
+) -> List[Tuple[str, float, float]]:
+    """
+    Same contract as similar_posts, but scans the low-dimensional copies first
+    and rescores only the `shortlist` best candidates with the full vectors.
+    Falls back to the exact path until coarse.fit_projection() has been run.
+    """
+    model, version = serving()
+    q = embed_text_query(query_text, model_name=model).astype(np.float32)
+    return _two_stage(q, top_k, min_score, _effective_topic(topic), version, shortlist)
+
+
+def similar_posts_streaming(
+    query_text: str,
+    top_k: Optional[int] = 10,
+    min_score: Optional[float] = 0.80,
+    topic: Optional[str] = None,
+    block_size: Optional[int] = None
+) -> List[Tuple[str, float, float]]:
+    """
+    Same results as similar_posts, bit for bit, but reads the topic from SQLite in
+    blocks of `block_size` rows (default CFG.stream_block_size) and keeps only a
+    running top-k, so memory does not grow with the number of posts.
+    """
+    model, version = serving()
+    q = embed_text_query(query_text, model_name=model).astype(np.float32)
+    k = max(top_k, 0)
+    if k == 0:
+        return []
+
+    # min-heap of the best k so far; ties rank earlier rows first, like _select
+    heap: List[Tuple[float, int, str]] = []
+    seen = 0
+
+    def push(ids, M: np.ndarray) -> None:
+        nonlocal seen
+        sims = M @ q
+        idx = np.nonzero(sims >= min_score)[0]
+        if len(idx) > k:
+            idx = idx[np.argsort(-sims[idx], kind="stable")[:k]]
+        for i in idx:
+            item = (float(sims[i]), -(seen + int(i)), ids[i])
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        seen += len(ids)
+
+    # Score in the same CFG.stream_block_size chunks as _scores, whatever size
+    # the SQLite reads come in; only then do the float32 results match exactly.
+    B = max(int(CFG.stream_block_size), 1)
+    carry_ids: List[str] = []
+    carry: List[np.ndarray] = []
+    blocks = iter_embedding_blocks(_effective_topic(topic), version, block_size or B)
+    for ids, M in blocks:
+        carry_ids.extend(ids)
+        carry.append(M)
+        if len(carry_ids) < B:
+            continue
+        buf = np.vstack(carry) if len(carry) > 1 else carry[0]
+        start = 0
+        while len(carry_ids) - start >= B:
+            push(carry_ids[start:start + B], buf[start:start + B])
+            start += B
+        carry_ids = carry_ids[start:]
+        carry = [buf[start:]] if carry_ids else []
+    if carry_ids:
+        push(carry_ids, np.vstack(carry))
+
+    return [(pid, calibrate(raw), raw) for raw, _, pid in sorted(heap, reverse=True)]
 
-    ids, vecs = zip(*items)
-    M = np.vstack(vecs)
-    sims = M @ q
-    order = np.argsort(-sims)
+
+def two_stage_recall(
+    queries: Iterable[str],
+    top_k: Optional[int] = 10,
+    min_score: Optional[float] = 0.80,
+    topic: Optional[str] = None,
+    shortlist: Optional[int] = None
+) -> float:
+    """
+    Fraction of the exact similar_posts hits that the two-stage search also returns,
+    pooled over all queries (1.0 when the exact path finds nothing).
+    """
+    effective_topic = _effective_topic(topic)
+    model, version = serving()
+    found = 0
+    total = 0
+    for text in queries:
+        q = embed_text_query(text, model_name=model).astype(np.float32)
+        exact = {pid for pid, _, _ in _exact(q, top_k, min_score, effective_topic, version)}
+        approx = {pid for pid, _, _ in _two_stage(q, top_k, min_score, effective_topic, version, shortlist)}
+        found += len(exact & approx)
+        total += len(exact)
+    return found / total if total else 1.0
+
+
+def _effective_topic(topic: Optional[str]) -> Optional[str]:
+    # Treat "" as None (match-all)
+    return None if (topic is None or str(topic).strip() == "") else topic
+
+
+def _scores(M: np.ndarray, q: np.ndarray) -> np.ndarray:
+    # BLAS gemv over fixed CFG.stream_block_size row blocks. gemv picks kernels by
+    # shape, so the last bit of a score depends on the block it was computed in;
+    # similar_posts_streaming scores the same blocks and therefore matches exactly.
+    B = max(int(CFG.stream_block_size), 1)
+    if len(M) <= B:
+        return M @ q
+    out = np.empty(len(M), dtype=np.result_type(M, q))
+    for s in range(0, len(M), B):
+        out[s:s + B] = M[s:s + B] @ q
+    return out
+
+
+def _rank(ids, M: np.ndarray, q: np.ndarray, top_k, min_score) -> List[Tuple[str, float, float]]:
+    return _select(ids, _scores(M, q), top_k, min_score)
+
+
+def _select(ids, sims: np.ndarray, top_k, min_score) -> List[Tuple[str, float, float]]:
+    order = np.argsort(-sims, kind="stable")
 
     out: List[Tuple[str, float, float]] = []
     for idx in order[:max(top_k, 0)]:
@@ -61,3 +197,35 @@ def similar_posts(
         if raw >= min_score:
             out.append((ids[idx], calibrate(raw), raw))
     return out
+
+
+def _exact(q: np.ndarray, top_k, min_score, topic: Optional[str], version: Optional[Version]) -> List[Tuple[str, float, float]]:
+    items = fetch_embeddings(topic=topic, version=version)
+    if not items:
+        return []
+
+    ids, vecs = zip(*items)
+    return _rank(ids, np.vstack(vecs), q, top_k, min_score)
+
+
+def _two_stage(q: np.ndarray, top_k, min_score, topic: Optional[str], version: Optional[Version],
+               shortlist: Optional[int]) -> List[Tuple[str, float, float]]:
+    q_low = project(q, version)
+    ids, L = coarse_vectors(topic) if q_low is not None else ([], None)
+    if not ids or L.shape[1] != q_low.shape[0]:  # no index yet, or refitted in between
+        return _exact(q, top_k, min_score, topic, version)
+
+    approx = L @ q_low
+
+    n = max(int(shortlist or CFG.coarse_shortlist), max(top_k, 0))
+    if n < len(approx):
+        cand = np.argpartition(-approx, n - 1)[:n]
+    else:
+        cand = np.arange(len(approx))
+
+    full = fetch_embeddings_by_ids([ids[i] for i in cand])
+    if not full:
+        return []
+
+    cand_ids, cand_vecs = zip(*full)
+    return _rank(cand_ids, np.vstack(cand_vecs), q, top_k, min_score)
@@ -0,0 +1,185 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from .config import CFG
+from .storage import (
+    Version,
+    read_connection,
+    read_epoch,
+    max_embedding_rowid,
+    fetch_embeddings_between,
+    oldest_post_time,
+)
+
+# Daily vector segments for time-windowed search.
+#
+# Posts are bucketed by the UTC day of posts.updated_at. A windowed query only
+# loads the days it covers (all missing days in one range query); loaded days
+# stay in an LRU of at most CFG.segment_cache_size segments, or as many days as
+# the current query spans, and are reloaded from SQLite on demand.
+#
+# A cached day is reused while the meta epoch (see resident.py) is unchanged.
+# Embeddings inserted since (a backfill of old posts, an ingest crossing
+# midnight) are picked up per query from one rowid-delta read over the window
+# and appended to the days they belong to.
+
+_DAY = 86400
+_FMT = "%Y-%m-%d %H:%M:%S"
+
+
+class _Segment:
+    def __init__(self, ids: List[str], ts: np.ndarray, M: Optional[np.ndarray], epoch: int, rowid: int):
+        self.ids = ids
+        self.ts = ts          # (N,) unix seconds
+        self.M = M            # (N, D)
+        self.epoch = epoch
+        self.rowid = rowid    # every embeddings row up to here is included
+
+    def extended(self, rows: List[Tuple[int, str, int, np.ndarray]], rowid: int) -> "_Segment":
+        # a new object, so a concurrent query keeps a consistent (ids, ts, M)
+        if not rows:
+            return _Segment(self.ids, self.ts, self.M, self.epoch, rowid)
+        add = np.vstack([v for _, _, _, v in rows])
+        return _Segment(
+            self.ids + [pid for _, pid, _, _ in rows],
+            np.concatenate([self.ts, np.array([t for _, _, t, _ in rows], dtype=np.int64)]),
+            add if self.M is None else np.vstack([self.M, add]),
+            self.epoch,
+            rowid,
+        )
+
+
+_SEGMENTS: "OrderedDict[tuple, _Segment]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def _to_unix(when: Union[datetime, str]) -> int:
+    if isinstance(when, str):
+        when = datetime.fromisoformat(when)
+    if when.tzinfo is None:  # naive datetimes are UTC, like CURRENT_TIMESTAMP
+        when = when.replace(tzinfo=timezone.utc)
+    return int(when.timestamp())
+
+
+def _fmt(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime(_FMT)
+
+
+def window_start(
+    since: Optional[Union[datetime, str]] = None,
+    window: Optional[Union[timedelta, float]] = None,
+) -> Optional[int]:
+    """Unix-seconds lower bound for `since` and/or `window` (a timedelta or days); the later one wins."""
+    bounds = []
+    if since is not None:
+        bounds.append(_to_unix(since))
+    if window is not None:
+        if not isinstance(window, timedelta):
+            window = timedelta(days=float(window))
+        bounds.append(int((datetime.now(timezone.utc) - window).timestamp()))
+    return max(bounds) if bounds else None
+
+
+def _key(day: int, topic: Optional[str], version: Optional[Version]) -> tuple:
+    return (str(CFG.db_path), topic, version, day)
+
+
+def _split(rows: List[Tuple[int, str, int, np.ndarray]], days) -> Dict[int, list]:
+    per_day: Dict[int, list] = {day: [] for day in days}
+    for row in rows:
+        day = row[2] // _DAY * _DAY
+        if day in per_day:
+            per_day[day].append(row)
+    return per_day
+
+
+def _segments(con: sqlite3.Connection, days: List[int], topic: Optional[str], version: Optional[Version]) -> Dict[int, _Segment]:
+    """Up-to-date segments of `days` (ascending), loading all missing days with one range query."""
+    epoch, rowid = read_epoch(con), max_embedding_rowid(con)
+    keys = {day: _key(day, topic, version) for day in days}
+    with _LOCK:
+        segs = {}
+        for day, key in keys.items():
+            seg = _SEGMENTS.get(key)
+            if seg is not None and seg.epoch == epoch:
+                segs[day] = seg
+
+    missing = [day for day in days if day not in segs]
+    if missing:
+        rows = fetch_embeddings_between(con, _fmt(missing[0]), _fmt(missing[-1] + _DAY),
+                                        topic=topic, version=version, upto=rowid)
+        empty = _Segment([], np.empty(0, dtype=np.int64), None, epoch, 0)
+        for day, day_rows in _split(rows, missing).items():
+            segs[day] = empty.extended(day_rows, rowid)
+
+    # cached days: one read of the rows added since the stalest of them
+    lo = min(seg.rowid for seg in segs.values())
+    if lo < rowid:
+        rows = fetch_embeddings_between(con, _fmt(days[0]), topic=topic, version=version,
+                                        after_rowid=lo, upto=rowid)
+        for day, day_rows in _split(rows, days).items():
+            seg = segs[day]
+            if seg.rowid < rowid:
+                segs[day] = seg.extended([r for r in day_rows if r[0] > seg.rowid], rowid)
+
+    with _LOCK:
+        for day, key in keys.items():
+            _SEGMENTS[key] = segs[day]
+            _SEGMENTS.move_to_end(key)
+        # never evict the days of this query, even when it spans more than the cache size
+        mine = set(keys.values())
+        excess = len(_SEGMENTS) - max(int(CFG.segment_cache_size), 0)
+        for key in [k for k in _SEGMENTS if k not in mine][:max(excess, 0)]:
+            del _SEGMENTS[key]
+    return segs
+
+
+def window_vectors(
+    start: int,
+    topic: Optional[str] = None,
+    version: Optional[Version] = None,
+) -> Tuple[List[str], Optional[np.ndarray]]:
+    """Returns (ids, (N, D) matrix) of the posts updated at or after `start` (unix seconds)."""
+    with read_connection() as con:
+        oldest = oldest_post_time(con)
+        if oldest is None:
+            return [], None
+        first = max(start, oldest) // _DAY * _DAY
+        last = int(datetime.now(timezone.utc).timestamp()) // _DAY * _DAY
+        days = list(range(first, last + 1, _DAY))
+        if not days:
+            return [], None
+        segs = _segments(con, days, topic, version)
+
+    ids: List[str] = []
+    blocks = []
+    for day, seg in segs.items():
+        if not seg.ids:
+            continue
+        if day < start:  # partially covered first day
+            keep = seg.ts >= start
+            ids.extend(pid for pid, k in zip(seg.ids, keep) if k)
+            blocks.append(seg.M[keep])
+        else:
+            ids.extend(seg.ids)
+            blocks.append(seg.M)
+
+    if not ids:
+        return [], None
+    return ids, np.vstack(blocks)
+
+
+def evict_segments(before: Optional[Union[datetime, str]] = None) -> int:
+    """
+    Drops cached segments of days before `before` (all of them if None) and
+    returns how many were dropped. They are reloaded if a query needs them again.
+    """
+    cutoff = None if before is None else _to_unix(before)
+    with _LOCK:
+        keys = [k for k in _SEGMENTS if cutoff is None or k[3] + _DAY <= cutoff]
+        for k in keys:
+            del _SEGMENTS[k]
+    return len(keys)
@@ -1,8 +1,12 @@
 import sqlite3
 from contextlib import contextmanager
-from typing import List, Optional, Tuple
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
 import numpy as np
 from .config import CFG
+from .embedder import version_tag
+
+# (model, instruction) tag of an embedding, see embedder.embedding_version
+Version = Tuple[str, str]
 
 @contextmanager
 def _conn():
@@ -14,6 +18,39 @@ def _conn():
         con.commit()
         con.close()
 
+@contextmanager
+def read_connection():
+    """Plain connection for reads outside any write lock (each statement sees committed data)."""
+    init_db()
+    with _conn() as con:
+        yield con
+
+@contextmanager
+def write_transaction():
+    """
+    Connection inside BEGIN IMMEDIATE: holds the database write lock until the
+    block exits, so concurrent writers (threads or processes) are serialized.
+    Commits on success, rolls back on error.
+    """
+    init_db()
+    con = sqlite3.connect(CFG.db_path, isolation_level=None)
+    con.execute("PRAGMA foreign_keys = ON;")
+    try:
+        con.execute("BEGIN IMMEDIATE;")
+        yield con
+        con.execute("COMMIT;")
+    except BaseException:
+        if con.in_transaction:
+            con.execute("ROLLBACK;")
+        raise
+    finally:
+        con.close()
+
+_BUMP_EPOCH = """
+INSERT INTO meta (key, value) VALUES ('epoch', '1')
+ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+"""
+
 def init_db():
     with _conn() as con:
         cur = con.cursor()
@@ -30,11 +67,106 @@ def init_db():
           post_id TEXT PRIMARY KEY,
           dim     INTEGER NOT NULL,
           vec     BLOB NOT NULL,
+          model       TEXT,
+          instruction TEXT,
           FOREIGN KEY(post_id) REFERENCES posts(post_id) ON DELETE CASCADE
         );
         """)
+        # databases created before embeddings were versioned
+        cols = {row[1] for row in cur.execute("PRAGMA table_info(embeddings);")}
+        if "model" not in cols:
+            cur.execute("ALTER TABLE embeddings ADD COLUMN model TEXT;")
+            cur.execute("ALTER TABLE embeddings ADD COLUMN instruction TEXT;")
+        # vectors of the model being migrated to, promoted into `embeddings` once complete
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS embeddings_next(
+          post_id     TEXT PRIMARY KEY,
+          dim         INTEGER NOT NULL,
+          vec         BLOB NOT NULL,
+          model       TEXT NOT NULL,
+          instruction TEXT NOT NULL,
+          FOREIGN KEY(post_id) REFERENCES posts(post_id) ON DELETE CASCADE
+        );
+        """)
+        cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_posts_text_next
+        AFTER UPDATE OF text ON posts
+        WHEN OLD.text IS NOT NEW.text
+        BEGIN
+          DELETE FROM embeddings_next WHERE post_id = NEW.post_id;
+        END;
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS meta(
+          key   TEXT PRIMARY KEY,
+          value TEXT
+        );
+        """)
+        # rows written before embeddings were versioned: tag them once with the
+        # version of the pinned serving model (see migrate.serving_model)
+        done = cur.execute("SELECT 1 FROM meta WHERE key = 'legacy_tagged';").fetchone()
+        if done is None:
+            cur.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('serving_model', ?);", (CFG.model_name,))
+            serving = cur.execute("SELECT value FROM meta WHERE key = 'serving_model';").fetchone()[0]
+            cur.execute("UPDATE embeddings SET model = ?, instruction = ? WHERE model IS NULL;", version_tag(serving))
+            cur.execute("INSERT INTO meta (key, value) VALUES ('legacy_tagged', '1');")
+        # meta "epoch" moves whenever stored vectors change other than by appending,
+        # so in-memory copies (resident.py) know when a full reload is needed
+        for name, event in (
+            ("trg_embeddings_delete_epoch", "DELETE ON embeddings"),
+            ("trg_embeddings_update_epoch", "UPDATE ON embeddings"),
+            ("trg_posts_update_epoch", "UPDATE ON posts"),
+        ):
+            cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name}
+            AFTER {event}
+            BEGIN
+              {_BUMP_EPOCH}
+            END;
+            """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS coarse_embeddings(
+          post_id TEXT PRIMARY KEY,
+          dim     INTEGER NOT NULL,
+          vec     BLOB NOT NULL,
+          FOREIGN KEY(post_id) REFERENCES embeddings(post_id) ON DELETE CASCADE
+        );
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS projection(
+          id         INTEGER PRIMARY KEY CHECK (id = 1),
+          method     TEXT NOT NULL,
+          dim        INTEGER NOT NULL,
+          full_dim   INTEGER NOT NULL,
+          components BLOB NOT NULL,
+          model       TEXT,
+          instruction TEXT
+        );
+        """)
+        cols = {row[1] for row in cur.execute("PRAGMA table_info(projection);")}
+        if "model" not in cols:
+            cur.execute("ALTER TABLE projection ADD COLUMN model TEXT;")
+            cur.execute("ALTER TABLE projection ADD COLUMN instruction TEXT;")
+        # a rewritten vector invalidates its coarse copy (index_embeddings adds it back);
+        # rewritten coarse rows move the epoch like embeddings do
+        cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_embeddings_update_coarse
+        AFTER UPDATE ON embeddings
+        BEGIN
+          DELETE FROM coarse_embeddings WHERE post_id = NEW.post_id;
+        END;
+        """)
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_coarse_update_epoch
+        AFTER UPDATE ON coarse_embeddings
+        BEGIN
+          {_BUMP_EPOCH}
+        END;
+        """)
         cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_topic ON posts(topic);")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_updated_at ON posts(updated_at);")
+        # time-windowed loads of one topic (segments.py)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_topic_updated_at ON posts(topic, updated_at);")
 
 def _to_blob(vec: np.ndarray) -> bytes:
     assert vec.dtype == np.float32 and vec.ndim == 1
@@ -55,17 +187,48 @@ def upsert_post(post_id: str, text: str, topic: Optional[str]) -> None:
           updated_at=CURRENT_TIMESTAMP;
         """, (post_id, topic, text))
 
-def upsert_embedding(post_id: str, vec: np.ndarray) -> None:
+def upsert_embedding(post_id: str, vec: np.ndarray, version: Optional[Version] = None) -> None:
     init_db()
     dim = int(vec.shape[0])
+    model, instruction = version or (None, None)
     with _conn() as con:
         con.execute("""
-        INSERT INTO embeddings (post_id, dim, vec)
+        INSERT INTO embeddings (post_id, dim, vec, model, instruction)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(post_id) DO UPDATE SET
+          dim=excluded.dim,
+          vec=excluded.vec,
+          model=excluded.model,
+          instruction=excluded.instruction;
+        """, (post_id, dim, _to_blob(vec), model, instruction))
+
+def upsert_posts(rows: Iterable[Tuple[str, str, Optional[str]]]) -> None:
+    """Bulk upsert_post for (post_id, text, topic) rows, in one transaction."""
+    init_db()
+    with _conn() as con:
+        con.executemany("""
+        INSERT INTO posts (post_id, topic, text)
         VALUES (?, ?, ?)
+        ON CONFLICT(post_id) DO UPDATE SET
+          topic=excluded.topic,
+          text=excluded.text,
+          updated_at=CURRENT_TIMESTAMP;
+        """, ((pid, topic, text) for pid, text, topic in rows))
+
+def upsert_embeddings(items: Iterable[Tuple[str, np.ndarray]], version: Optional[Version] = None) -> None:
+    """Bulk upsert_embedding, in one transaction."""
+    init_db()
+    model, instruction = version or (None, None)
+    with _conn() as con:
+        con.executemany("""
+        INSERT INTO embeddings (post_id, dim, vec, model, instruction)
+        VALUES (?, ?, ?, ?, ?)
         ON CONFLICT(post_id) DO UPDATE SET
           dim=excluded.dim,
-          vec=excluded.vec;
-        """, (post_id, dim, _to_blob(vec)))
+          vec=excluded.vec,
+          model=excluded.model,
+          instruction=excluded.instruction;
+        """, ((pid, int(vec.shape[0]), _to_blob(vec), model, instruction) for pid, vec in items))
 
 def delete_post_and_embedding(post_id: str) -> bool:
     """Deletes the post and its embedding. Returns True if a row was deleted."""
@@ -75,22 +238,28 @@ def delete_post_and_embedding(post_id: str) -> bool:
         cur.execute("DELETE FROM posts WHERE post_id = ?;", (post_id,))
         return cur.rowcount > 0
 
-def fetch_embeddings(topic: Optional[str] = None) -> List[Tuple[str, np.ndarray]]:
-    """Returns list of (post_id, vector) filtered by topic if provided."""
+def _where(topic: Optional[str], version: Optional[Version]) -> Tuple[str, list]:
+    """WHERE clause over posts `p` / embeddings `e` for the topic and version filters."""
+    conds, params = [], []
+    if topic is not None:
+        conds.append("p.topic = ?")
+        params.append(topic)
+    if version is not None:
+        conds.append("e.model = ? AND e.instruction = ?")
+        params.extend(version)
+    return ("WHERE " + " AND ".join(conds)) if conds else "", params
+
+def fetch_embeddings(topic: Optional[str] = None, version: Optional[Version] = None) -> List[Tuple[str, np.ndarray]]:
+    """Returns list of (post_id, vector) filtered by topic and embedding version if provided."""
     init_db()
+    where, params = _where(topic, version)
     with _conn() as con:
         cur = con.cursor()
-        if topic is None:
-            cur.execute("""
-                SELECT e.post_id, e.dim, e.vec
-                FROM embeddings e JOIN posts p ON p.post_id = e.post_id;
-            """)
-        else:
-            cur.execute("""
-                SELECT e.post_id, e.dim, e.vec
-                FROM embeddings e JOIN posts p ON p.post_id = e.post_id
-                WHERE p.topic = ?;
-            """, (topic,))
+        cur.execute(f"""
+            SELECT e.post_id, e.dim, e.vec
+            FROM embeddings e JOIN posts p ON p.post_id = e.post_id
+            {where};
+        """, params)
         rows = cur.fetchall()
 
     out = []
@@ -98,6 +267,111 @@ def fetch_embeddings(topic: Optional[str] = None) -> List[Tuple[str, np.ndarray]
         out.append((post_id, _from_blob(blob, int(dim))))
     return out
 
+def count_embeddings(topic: Optional[str] = None, version: Optional[Version] = None) -> int:
+    """Number of rows fetch_embeddings would return."""
+    init_db()
+    where, params = _where(topic, version)
+    with _conn() as con:
+        return int(con.execute(f"""
+            SELECT COUNT(*)
+            FROM embeddings e JOIN posts p ON p.post_id = e.post_id
+            {where};
+        """, params).fetchone()[0])
+
+def iter_embedding_blocks(
+    topic: Optional[str] = None,
+    version: Optional[Version] = None,
+    block_size: int = 4096,
+) -> Iterator[Tuple[List[str], np.ndarray]]:
+    """
+    Yields (post_ids, (n, D) matrix) blocks of at most `block_size` rows, in the
+    same row order as fetch_embeddings, without materialising the whole topic.
+    """
+    init_db()
+    where, params = _where(topic, version)
+    with _conn() as con:
+        cur = con.cursor()
+        cur.execute(f"""
+            SELECT e.post_id, e.dim, e.vec
+            FROM embeddings e JOIN posts p ON p.post_id = e.post_id
+            {where};
+        """, params)
+        while True:
+            rows = cur.fetchmany(max(int(block_size), 1))
+            if not rows:
+                return
+            dim = int(rows[0][1])
+            if all(int(d) == dim for _, d, _ in rows):
+                M = np.frombuffer(b"".join(blob for _, _, blob in rows), dtype=np.float32).reshape(len(rows), dim)
+            else:
+                M = np.vstack([_from_blob(blob, int(d)) for _, d, blob in rows])
+            yield [post_id for post_id, _, _ in rows], M
+
+def fetch_embeddings_by_ids(post_ids: Sequence[str]) -> List[Tuple[str, np.ndarray]]:
+    """Returns list of (post_id, vector) for the given ids (missing ids are skipped)."""
+    init_db()
+    rows = []
+    with _conn() as con:
+        cur = con.cursor()
+        # stay well below SQLite's bound-parameter limit
+        for i in range(0, len(post_ids), 500):
+            chunk = list(post_ids[i:i + 500])
+            marks = ",".join("?" * len(chunk))
+            cur.execute(f"""
+                SELECT post_id, dim, vec FROM embeddings
+                WHERE post_id IN ({marks});
+            """, chunk)
+            rows.extend(cur.fetchall())
+
+    return [(post_id, _from_blob(blob, int(dim))) for post_id, dim, blob in rows]
+
+def save_projection(method: str, components: np.ndarray, version: Version) -> None:
+    """
+    Stores the (dim, full_dim) projection matrix fitted on `version` vectors and
+    drops the now-stale coarse vectors.
+    """
+    init_db()
+    components = np.ascontiguousarray(components, dtype=np.float32)
+    dim, full_dim = components.shape
+    with _conn() as con:
+        con.execute("DELETE FROM coarse_embeddings;")
+        con.execute("""
+        INSERT INTO projection (id, method, dim, full_dim, components, model, instruction)
+        VALUES (1, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+          method=excluded.method,
+          dim=excluded.dim,
+          full_dim=excluded.full_dim,
+          components=excluded.components,
+          model=excluded.model,
+          instruction=excluded.instruction;
+        """, (method, int(dim), int(full_dim), components.tobytes(order="C"), version[0], version[1]))
+        con.execute(_BUMP_EPOCH)
+
+def load_projection() -> Optional[Tuple[str, np.ndarray, Version]]:
+    """Returns (method, components, version) or None if no projection was fitted yet."""
+    init_db()
+    with _conn() as con:
+        row = con.execute(
+            "SELECT method, dim, full_dim, components, model, instruction FROM projection WHERE id = 1;"
+        ).fetchone()
+    if row is None:
+        return None
+    method, dim, full_dim, blob, model, instruction = row
+    comps = np.frombuffer(blob, dtype=np.float32, count=int(dim) * int(full_dim))
+    return method, comps.reshape(int(dim), int(full_dim)), (model, instruction)
+
+def upsert_coarse_embeddings(items: Iterable[Tuple[str, np.ndarray]]) -> None:
+    init_db()
+    with _conn() as con:
+        con.executemany("""
+        INSERT INTO coarse_embeddings (post_id, dim, vec)
+        VALUES (?, ?, ?)
+        ON CONFLICT(post_id) DO UPDATE SET
+          dim=excluded.dim,
+          vec=excluded.vec;
+        """, ((pid, int(vec.shape[0]), _to_blob(vec)) for pid, vec in items))
+
 def missing_embedding_posts(topic: Optional[str]) -> List[Tuple[str, str]]:
     """Returns [(post_id, text)] where posts exist but no embedding yet."""
     init_db()
@@ -130,3 +404,228 @@ def list_posts(topic: Optional[str] = None) -> List[Tuple[str, str]]:
             cur.execute("SELECT post_id, text FROM posts WHERE topic = ?;", (topic,))
         rows = cur.fetchall()
     return rows
+
+# --- Embedding versions / online migration ---
+def get_or_set_meta(key: str, default: str) -> str:
+    """Returns meta[key], storing `default` first if the key is not set yet."""
+    init_db()
+    with _conn() as con:
+        row = con.execute("SELECT value FROM meta WHERE key = ?;", (key,)).fetchone()
+        if row is not None:
+            return row[0]
+        con.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?);", (key, default))
+        return con.execute("SELECT value FROM meta WHERE key = ?;", (key,)).fetchone()[0]
+
+def get_meta(key: str) -> Optional[str]:
+    init_db()
+    with _conn() as con:
+        row = con.execute("SELECT value FROM meta WHERE key = ?;", (key,)).fetchone()
+    return row[0] if row else None
+
+def pending_next_embeddings(version: Version, limit: int) -> List[Tuple[str, str]]:
+    """Returns up to `limit` [(post_id, text)] that have no `version` vector in embeddings_next yet."""
+    init_db()
+    with _conn() as con:
+        return con.execute("""
+          SELECT p.post_id, p.text
+          FROM posts p
+          LEFT JOIN embeddings_next n
+            ON n.post_id = p.post_id AND n.model = ? AND n.instruction = ?
+          WHERE n.post_id IS NULL
+          LIMIT ?;
+        """, (version[0], version[1], int(limit))).fetchall()
+
+def count_next_embeddings(version: Version) -> Tuple[int, int]:
+    """Returns (posts with a `version` vector in embeddings_next, total posts)."""
+    init_db()
+    with _conn() as con:
+        done = con.execute(
+            "SELECT COUNT(*) FROM embeddings_next WHERE model = ? AND instruction = ?;", version
+        ).fetchone()[0]
+        total = con.execute("SELECT COUNT(*) FROM posts;").fetchone()[0]
+    return int(done), int(total)
+
+def upsert_next_embeddings(items: Iterable[Tuple[str, np.ndarray]], version: Version) -> None:
+    init_db()
+    with _conn() as con:
+        con.executemany("""
+        INSERT INTO embeddings_next (post_id, dim, vec, model, instruction)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(post_id) DO UPDATE SET
+          dim=excluded.dim,
+          vec=excluded.vec,
+          model=excluded.model,
+          instruction=excluded.instruction;
+        """, ((pid, int(vec.shape[0]), _to_blob(vec), version[0], version[1]) for pid, vec in items))
+
+def promote_next_embeddings(version: Version, meta_key: str, meta_value: str) -> bool:
+    """
+    Atomically replaces `embeddings` with the `version` vectors of embeddings_next
+    and sets meta[meta_key] = meta_value. Does nothing and returns False while any
+    post still lacks a `version` vector. The coarse index is dropped (stale).
+    """
+    # writers wait, readers keep the old snapshot until COMMIT
+    with write_transaction() as con:
+        missing = con.execute("""
+          SELECT COUNT(*) FROM posts p
+          LEFT JOIN embeddings_next n
+            ON n.post_id = p.post_id AND n.model = ? AND n.instruction = ?
+          WHERE n.post_id IS NULL;
+        """, version).fetchone()[0]
+        if missing:
+            return False
+
+        con.execute("DELETE FROM embeddings;")
+        con.execute("""
+          INSERT INTO embeddings (post_id, dim, vec, model, instruction)
+          SELECT post_id, dim, vec, model, instruction FROM embeddings_next
+          WHERE model = ? AND instruction = ?;
+        """, version)
+        con.execute("DELETE FROM embeddings_next;")
+        con.execute("DELETE FROM projection;")
+        con.execute("""
+          INSERT INTO meta (key, value) VALUES (?, ?)
+          ON CONFLICT(key) DO UPDATE SET value=excluded.value;
+        """, (meta_key, meta_value))
+        return True
+
+def stale_embedding_posts(version: Version, limit: int) -> List[Tuple[str, str]]:
+    """Returns up to `limit` [(post_id, text)] whose embedding carries a tag other than `version`."""
+    init_db()
+    with _conn() as con:
+        return con.execute("""
+          SELECT p.post_id, p.text
+          FROM posts p JOIN embeddings e ON e.post_id = p.post_id
+          WHERE e.model IS NULL OR e.model != ? OR e.instruction IS NOT ?
+          LIMIT ?;
+        """, (version[0], version[1], int(limit))).fetchall()
+
+# --- Helpers running on a caller-owned connection (see write_transaction) ---
+def read_epoch(con: sqlite3.Connection) -> int:
+    row = con.execute("SELECT value FROM meta WHERE key = 'epoch';").fetchone()
+    return int(row[0]) if row else 0
+
+def read_meta(con: sqlite3.Connection, key: str) -> Optional[str]:
+    row = con.execute("SELECT value FROM meta WHERE key = ?;", (key,)).fetchone()
+    return row[0] if row else None
+
+def max_embedding_rowid(con: sqlite3.Connection) -> int:
+    return int(con.execute("SELECT COALESCE(MAX(rowid), 0) FROM embeddings;").fetchone()[0])
+
+def fetch_embeddings_after(
+    con: sqlite3.Connection,
+    after_rowid: int,
+    topic: Optional[str] = None,
+    version: Optional[Version] = None,
+    upto: Optional[int] = None,
+) -> List[Tuple[int, str, np.ndarray]]:
+    """Returns [(rowid, post_id, vector)] of embeddings rows with after_rowid < rowid <= upto, in rowid order."""
+    where, params = _where(topic, version)
+    where = (where + " AND" if where else "WHERE") + " e.rowid > ?"
+    params.append(int(after_rowid))
+    if upto is not None:
+        where += " AND e.rowid <= ?"
+        params.append(int(upto))
+    # CROSS JOIN keeps embeddings as the outer loop: SQLite walks only the rowid
+    # range instead of the topic's whole history through idx_posts_topic
+    rows = con.execute(f"""
+        SELECT e.rowid, e.post_id, e.dim, e.vec
+        FROM embeddings e CROSS JOIN posts p ON p.post_id = e.post_id
+        {where}
+        ORDER BY e.rowid;
+    """, params).fetchall()
+    return [(rowid, post_id, _from_blob(blob, int(dim))) for rowid, post_id, dim, blob in rows]
+
+def fetch_embeddings_between(
+    con: sqlite3.Connection,
+    start: str,
+    end: Optional[str] = None,
+    topic: Optional[str] = None,
+    version: Optional[Version] = None,
+    after_rowid: int = 0,
+    upto: Optional[int] = None,
+) -> List[Tuple[int, str, int, np.ndarray]]:
+    """
+    Returns [(rowid, post_id, updated_at as unix seconds, vector)] for posts with
+    start <= updated_at < end ('YYYY-MM-DD HH:MM:SS', UTC like CURRENT_TIMESTAMP;
+    no upper bound if end is None) whose embeddings rowid is in (after_rowid, upto].
+    """
+    where, params = _where(topic, version)
+    conds = ["p.updated_at >= ?"]
+    params.append(start)
+    if end is not None:
+        conds.append("p.updated_at < ?")
+        params.append(end)
+    if after_rowid:
+        conds.append("e.rowid > ?")
+        params.append(int(after_rowid))
+    if upto is not None:
+        conds.append("e.rowid <= ?")
+        params.append(int(upto))
+    where = (where + " AND " if where else "WHERE ") + " AND ".join(conds)
+    # CROSS JOIN fixes the outer loop: a rowid delta walks the embeddings rowid
+    # range, a time range walks (topic, updated_at) / updated_at on posts
+    if after_rowid:
+        source = "embeddings e CROSS JOIN posts p ON p.post_id = e.post_id"
+    else:
+        source = "posts p CROSS JOIN embeddings e ON e.post_id = p.post_id"
+    rows = con.execute(f"""
+        SELECT e.rowid, e.post_id, CAST(strftime('%s', p.updated_at) AS INTEGER), e.dim, e.vec
+        FROM {source}
+        {where};
+    """, params).fetchall()
+    return [(rowid, post_id, int(ts), _from_blob(blob, int(dim))) for rowid, post_id, ts, dim, blob in rows]
+
+def oldest_post_time(con: sqlite3.Connection) -> Optional[int]:
+    """Earliest posts.updated_at (unix seconds) over all topics, or None if there are no posts (one index lookup)."""
+    row = con.execute("SELECT CAST(strftime('%s', MIN(updated_at)) AS INTEGER) FROM posts;").fetchone()
+    return None if row[0] is None else int(row[0])
+
+def max_coarse_rowid(con: sqlite3.Connection) -> int:
+    return int(con.execute("SELECT COALESCE(MAX(rowid), 0) FROM coarse_embeddings;").fetchone()[0])
+
+def fetch_coarse_after(
+    con: sqlite3.Connection,
+    after_rowid: int,
+    topic: Optional[str] = None,
+    version: Optional[Version] = None,
+    upto: Optional[int] = None,
+) -> List[Tuple[int, str, np.ndarray]]:
+    """
+    Returns [(rowid, post_id, low-dimensional vector)] of coarse rows with
+    after_rowid < rowid <= upto, in rowid order. Coarse rows all belong to the
+    projection's version, so `version` is not looked at.
+    """
+    join, conds, params = "", ["c.rowid > ?"], [int(after_rowid)]
+    if upto is not None:
+        conds.append("c.rowid <= ?")
+        params.append(int(upto))
+    if topic is not None:
+        # CROSS JOIN: walk the coarse rowid range, not the topic index (see fetch_embeddings_after)
+        join = "CROSS JOIN posts p ON p.post_id = c.post_id"
+        conds.append("p.topic = ?")
+        params.append(topic)
+    rows = con.execute(f"""
+        SELECT c.rowid, c.post_id, c.dim, c.vec
+        FROM coarse_embeddings c {join}
+        WHERE {" AND ".join(conds)}
+        ORDER BY c.rowid;
+    """, params).fetchall()
+    return [(rowid, post_id, _from_blob(blob, int(dim))) for rowid, post_id, dim, blob in rows]
+
+def replace_post_with_embedding(
+    con: sqlite3.Connection,
+    post_id: str,
+    text: str,
+    topic: Optional[str],
+    vec: np.ndarray,
+    version: Optional[Version] = None,
+) -> None:
+    """record_post's delete + insert of the post and its embedding, on `con`."""
+    model, instruction = version or (None, None)
+    con.execute("DELETE FROM posts WHERE post_id = ?;", (post_id,))
+    con.execute("INSERT INTO posts (post_id, topic, text) VALUES (?, ?, ?);", (post_id, topic, text))
+    con.execute("""
+    INSERT INTO embeddings (post_id, dim, vec, model, instruction)
+    VALUES (?, ?, ?, ?, ?);
+    """, (post_id, int(vec.shape[0]), _to_blob(vec), model, instruction))
@@ -10,7 +10,7 @@ import numpy as np
 from dataclasses import dataclass
 from typing import List, Tuple
 
-from dupdet.embedder import embed_text_document
+from dupdet.embedder import embed_text_documents
 from dupdet.calibration import calibrate
 
 # ===== Config =====
@@ -117,7 +117,7 @@ def cos(a, b) -> float:
 
 def embed_all(texts: List[str]):
     uniq = list(dict.fromkeys(texts))  # preserve order, dedupe
-    vecs = {t: embed_text_document(t) for t in uniq}
+    vecs = dict(zip(uniq, embed_text_documents(uniq)))
     return vecs
 
 # ---------- evaluation ----------
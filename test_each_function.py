@@ -1,5 +1,8 @@
-import os, sys, time
-from dupdet import record_post, similar_posts, batch_fill, delete_post
+import os, sys, time, sqlite3, threading
+from dupdet import record_post, similar_posts, similar_posts_streaming, batch_fill, delete_post, check_and_record
+from dupdet import evict_segments
+from dupdet.storage import upsert_posts
+from dupdet.migrate import reembed, serving_model, serving_version, migration_status
 from dupdet.config import CFG
 
 def expect(cond, msg):
@@ -21,27 +24,97 @@ def main():
     hits = similar_posts("Great idea!", top_k=5, min_score=0.30, topic="demo")
     print("similar_posts hits:", hits)
     expect(len(hits) >= 1, "similar_posts returns >= 1 result")
-    expect(isinstance(hits[0], tuple) and isinstance(hits[0][0], str) and isinstance(hits[0][1], float),
-           "similar_posts returns [(post_id:str, score:float), ...]")
+    expect(isinstance(hits[0], tuple) and isinstance(hits[0][0], str) and isinstance(hits[0][1], float)
+           and isinstance(hits[0][2], float),
+           "similar_posts returns [(post_id:str, score:float, raw:float), ...]")
 
-    # 3) batch_fill
+    # 3) similar_posts_streaming matches similar_posts exactly, whatever the read size
+    full = similar_posts("This proposal is great", top_k=10, min_score=-1.0, topic="demo")
+    for bs in (1, 3):
+        streamed = similar_posts_streaming("This proposal is great", top_k=10, min_score=-1.0,
+                                           topic="demo", block_size=bs)
+        expect(streamed == full, f"similar_posts_streaming(block_size={bs}) == similar_posts")
+
+    # 4) batch_fill
     batch_fill("demo", [("b1", "Bu fikir harika!"), ("b2", "هذه فكرة رائعة!")])
     hits2 = similar_posts("This proposal is great", top_k=10, min_score=0.30, topic="demo")
     print("after batch, hits:", hits2)
-    expect(any(pid in {"b1", "b2"} for pid, _ in hits2), "batch_fill posts appear in results")
+    expect(any(pid in {"b1", "b2"} for pid, _, _ in hits2), "batch_fill posts appear in results")
 
-    # 4) delete_post
+    # 5) delete_post
     record_post("d1", "Esta propuesta es fantástica.", topic="demo")
     hits3 = similar_posts("Esta propuesta es fantástica.", top_k=10, min_score=0.30, topic="demo")
     print("before delete:", hits3)
-    expect(any(pid == "d1" for pid, _ in hits3), "post to delete is searchable first")
+    expect(any(pid == "d1" for pid, _, _ in hits3), "post to delete is searchable first")
 
     ok = delete_post("d1")
     expect(ok is True, "delete_post returns True")
 
     hits4 = similar_posts("Esta propuesta es fantástica.", top_k=10, min_score=0.30, topic="demo")
     print("after delete:", hits4)
-    expect(all(pid != "d1" for pid, _ in hits4), "deleted post is not returned")
+    expect(all(pid != "d1" for pid, _, _ in hits4), "deleted post is not returned")
+
+    # 6) check_and_record: of simultaneous duplicates exactly one is stored
+    results = {}
+    def check(i):
+        results[i] = check_and_record(f"race{i}", "Two posts with the very same text.", topic="race",
+                                      skip_duplicates=True)
+    threads = [threading.Thread(target=check, args=(i,)) for i in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    con = sqlite3.connect(CFG.db_path)
+    stored = con.execute("SELECT COUNT(*) FROM posts WHERE topic = 'race';").fetchone()[0]
+    con.close()
+    print("check_and_record hits per thread:", results)
+    expect(stored == 1, "concurrent check_and_record stores exactly one of 8 duplicates")
+    expect(sum(1 for hits in results.values() if not hits) == 1, "the other 7 report the stored post as a hit")
+
+    # 7) windowed search: only recent posts; late inserts into cached days show up
+    record_post("w_new", "A fresh post about the new bridge.", topic="win")
+    record_post("w_old", "An old post about the old bridge.", topic="win")
+    upsert_posts([("w_late", "A late post about the bridge.", "win")])  # no embedding yet
+    con = sqlite3.connect(CFG.db_path)
+    con.execute("UPDATE posts SET updated_at = datetime('now', '-10 days') WHERE post_id IN ('w_old', 'w_late');")
+    con.commit()
+    con.close()
+
+    recent = {pid for pid, _, _ in similar_posts("bridge", top_k=10, min_score=-1.0, topic="win", window=3)}
+    print("window=3:", recent)
+    expect(recent == {"w_new"}, "window=3 excludes posts older than the window")
+
+    month = {pid for pid, _, _ in similar_posts("bridge", top_k=10, min_score=-1.0, topic="win", window=30)}
+    expect(month == {"w_new", "w_old"}, "window=30 includes the older post")
+
+    batch_fill("win")  # embeds w_late into the already cached day of 10 days ago
+    month = similar_posts("bridge", top_k=10, min_score=-1.0, topic="win", window=30)
+    print("window=30 after late insert:", month)
+    expect({pid for pid, _, _ in month} == {"w_new", "w_old", "w_late"}, "late insert into a cached past day shows up")
+
+    evict_segments()
+    again = similar_posts("bridge", top_k=10, min_score=-1.0, topic="win", window=30)
+    expect(again == month, "evict_segments + re-query returns the same hits")
+
+    # 8) model migration: old model serves until reembed completes, then every row carries the new tag
+    target = "intfloat/multilingual-e5-base"
+    record_post("m1", "Migration keeps serving the old vectors.", topic="mig")
+    before = serving_model()
+    expect(reembed(target, batch_size=2, pause=0, max_batches=1) is False, "reembed stops after max_batches")
+    status = migration_status(target)
+    print("migration status:", status)
+    expect(0 < status["done"] < status["total"], "migration is partway through")
+    expect(serving_model() == before, "search keeps serving the old model mid-migration")
+    hits5 = similar_posts("Migration keeps serving the old vectors.", top_k=1, min_score=0.30, topic="mig")
+    expect(hits5 and hits5[0][0] == "m1", "old-model search still finds the post mid-migration")
+
+    expect(reembed(target, pause=0) is True, "reembed completes")
+    expect(serving_model() == target, "serving switches to the target after completion")
+    con = sqlite3.connect(CFG.db_path)
+    tags = set(con.execute("SELECT model, instruction FROM embeddings;").fetchall())
+    con.close()
+    print("embedding tags:", tags)
+    expect(tags == {serving_version()}, "every row carries the new model's tag")
+    hits6 = similar_posts("Migration keeps serving the old vectors.", top_k=1, min_score=0.30, topic="mig")
+    expect(hits6 and hits6[0][0] == "m1", "search finds the post with the new model")
 
     print("\n🎉 All function-level tests passed.")
 